@@ -0,0 +1,9 @@
+# Gunicorn settings for `gunicorn wsgi:app`. Each worker builds its own
+# connection pool, so keep WEB_CONCURRENCY x DB_POOL_MAX (default 4 x 10)
+# below the Supabase pooler's client limit.
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', 5000)}"
+worker_class = 'gevent'
+workers = int(os.getenv('WEB_CONCURRENCY', 4))
+worker_connections = int(os.getenv('WORKER_CONNECTIONS', 100))
@@ -0,0 +1,114 @@
+-- =================================================================
+-- PERFORMANCE MIGRATIONS
+-- (Run once against the database after schema.sql. Every statement
+-- is idempotent, so re-running this file is safe.)
+-- =================================================================
+
+
+-- =================================================================
+-- 1. TRIGRAM INDEXES FOR SEARCH
+-- (Lets the '%term%' ILIKE searches in search() use an index instead
+-- of scanning every row. The indexed expressions MUST stay identical
+-- to the ones in run_criminal_dbms.py, or Postgres won't use them.)
+-- =================================================================
+CREATE EXTENSION IF NOT EXISTS pg_trgm;
+
+CREATE INDEX IF NOT EXISTS idx_criminal_trgm
+ON Criminal USING GIN ((FirstName || ' ' || LastName || ' ' || COALESCE(NationalID, '')) gin_trgm_ops);
+
+CREATE INDEX IF NOT EXISTS idx_case_trgm
+ON CaseTable USING GIN ((CaseTitle || ' ' || COALESCE(Description, '') || ' ' || COALESCE(CaseNumber, '')) gin_trgm_ops);
+
+
+-- =================================================================
+-- 2. STATUS INDEXES FOR THE DASHBOARD & REPORTS
+-- (The dashboard counts open/closed cases and the reports group by
+-- Status. The partial indexes hold only the rows each counter needs,
+-- so the counts can be answered with an index-only scan.)
+-- =================================================================
+CREATE INDEX IF NOT EXISTS idx_case_status ON CaseTable (Status);
+
+CREATE INDEX IF NOT EXISTS idx_criminal_status ON Criminal (Status);
+
+CREATE INDEX IF NOT EXISTS idx_case_open
+ON CaseTable (CaseID) WHERE Status IN ('Open', 'Under Investigation');
+
+CREATE INDEX IF NOT EXISTS idx_case_closed
+ON CaseTable (CaseID) WHERE Status LIKE 'Closed%';
+
+
+-- =================================================================
+-- 3. RECENT ACTIVITY INDEX
+-- (Serves the dashboard's "ORDER BY DateAssociated DESC LIMIT 5"
+-- without sorting the whole CriminalCase table.)
+-- =================================================================
+CREATE INDEX IF NOT EXISTS idx_cc_dateassoc ON CriminalCase (DateAssociated DESC);
+
+
+-- =================================================================
+-- 4. LOGIN LOOKUP & PASSWORD HASHES
+-- (Guarantees the login query is a unique B-tree lookup, and makes
+-- room for 60-character bcrypt hashes.)
+-- =================================================================
+CREATE UNIQUE INDEX IF NOT EXISTS idx_lawenf_username ON LawEnforcement (Username);
+
+ALTER TABLE LawEnforcement ALTER COLUMN PasswordHash TYPE VARCHAR(255);
+
+-- Hash any remaining plaintext passwords (from the sample data) with
+-- bcrypt, cost 12 to match BCRYPT_ROUNDS. login() only accepts bcrypt
+-- hashes, so run this before deploying that change. Rows that already
+-- hold a bcrypt hash are skipped, so re-running is safe.
+CREATE EXTENSION IF NOT EXISTS pgcrypto;
+
+UPDATE LawEnforcement
+SET PasswordHash = crypt(PasswordHash, gen_salt('bf', 12))
+WHERE PasswordHash NOT LIKE '$2%';
+
+
+-- =================================================================
+-- 5. SERVER-SIDE CASE NUMBERS
+-- (add_case no longer builds CaseNumber in Python. The timestamp keeps
+-- the old 'CASE-YYYYMMDDHHMMSS' shape; the random suffix stops two
+-- cases filed in the same second from colliding. The new values are
+-- 26 characters ('CASE-YYYYMMDDHHMMSS-xxxxxx') versus the old 19.
+-- schema.sql doesn't pin the column's width, so the DO block only
+-- retypes it when it is a VARCHAR shorter than that; TEXT or wider
+-- columns are left alone. view_ActiveCases (queries.sql) selects
+-- CaseNumber and Postgres won't retype a column a view depends on, so
+-- the view is dropped and recreated, unchanged, around the ALTER. The
+-- block runs as one transaction.)
+-- =================================================================
+DO $$
+DECLARE
+    had_view BOOLEAN := to_regclass('view_activecases') IS NOT NULL;
+BEGIN
+    IF EXISTS (
+        SELECT 1
+        FROM information_schema.columns
+        WHERE table_schema = current_schema()
+          AND table_name = 'casetable'
+          AND column_name = 'casenumber'
+          AND character_maximum_length < 26
+    ) THEN
+        DROP VIEW IF EXISTS view_ActiveCases;
+
+        ALTER TABLE CaseTable ALTER COLUMN CaseNumber TYPE VARCHAR(50);
+
+        IF had_view THEN
+            -- Same definition as queries.sql
+            CREATE VIEW view_ActiveCases AS
+            SELECT
+                ct.CaseNumber,
+                ct.CaseTitle,
+                ct.DateReported,
+                l.City,
+                l.Address
+            FROM CaseTable ct
+            JOIN Location l ON ct.LocationID = ct.LocationID
+            WHERE ct.Status = 'Open' OR ct.Status = 'Under Investigation';
+        END IF;
+    END IF;
+END $$;
+
+ALTER TABLE CaseTable ALTER COLUMN CaseNumber
+SET DEFAULT 'CASE-' || to_char(now(), 'YYYYMMDDHH24MISS') || '-' || substr(gen_random_uuid()::text, 1, 6);
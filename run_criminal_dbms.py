@@ -1,11 +1,18 @@
 import os
-import psycopg2
-import psycopg2.extras  # For dictionary cursors
+import csv
+import io
+import itertools
+import bcrypt
+import psycopg
+from psycopg.rows import dict_row, tuple_row  # For dictionary / plain tuple rows
+from psycopg_pool import ConnectionPool
 import datetime
+import threading
+from cachetools import TTLCache
 from dotenv import load_dotenv
-from flask import Flask, render_template, request, redirect, url_for, session, flash
-# We don't need these as we're using plain-text passwords per your schema
-# from werkzeug.security import generate_password_hash, check_password_hash
+from jinja2 import FileSystemBytecodeCache
+from werkzeug.exceptions import RequestEntityTooLarge
+from flask import Flask, render_template, request, redirect, url_for, session, flash, g, jsonify
 
 # --- 1. APP SETUP ---
 load_dotenv()
@@ -13,29 +20,223 @@ load_dotenv()
 app = Flask(__name__)
 # Make sure to set a strong, random secret key in your .env file
 app.secret_key = os.getenv('FLASK_SECRET_KEY', 'a_very_strong_default_secret_key_dev_only')
+# Caps every request body; the largest legitimate one is a bulk criminal CSV import
+app.config['MAX_CONTENT_LENGTH'] = int(os.getenv('MAX_UPLOAD_BYTES', 2 * 1024 * 1024))
+
+# Debug mode comes from FLASK_DEBUG. Outside debug, templates are never re-stat'ed
+# for changes, and compiled templates persist in a bytecode cache across restarts
+# (a per-user temp dir, or JINJA_CACHE_DIR if set; that directory must exist).
+app.config['TEMPLATES_AUTO_RELOAD'] = app.debug
+app.jinja_env.auto_reload = app.debug
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory=os.getenv('JINJA_CACHE_DIR'))
 
 # --- 2. DATABASE & UTILITY FUNCTIONS ---
 
+def _configure_connection(conn):
+    """Runs once for every new pooled connection."""
+    # Server-side prepared statements are OFF by default (psycopg's own default
+    # would prepare after 5 runs): the transaction-mode pooler on port 6543 hands
+    # each transaction a different server connection, so a statement prepared
+    # earlier may not exist there. See DB_PREPARE_THRESHOLD in _create_pool().
+    threshold = os.getenv('DB_PREPARE_THRESHOLD', 'none')
+    conn.prepare_threshold = None if threshold.lower() == 'none' else int(threshold)
+
+def _create_pool():
+    """Builds the process-wide connection pool against Supabase (PostgreSQL)."""
+    # This MUST be your Connection Pooler string (port 6543).
+    # Only if DATABASE_URL points at a session-mode pooler (port 5432) or a
+    # direct connection, set DB_PREPARE_THRESHOLD=1 so every statement is
+    # prepared server-side on first use and parse/plan is paid once per connection.
+    conn_string = os.getenv('DATABASE_URL')
+    if not conn_string:
+        print("DATABASE_URL not found in .env file!")
+        return None
+    try:
+        # Keep max_size below the Supabase pooler's client limit
+        return ConnectionPool(
+            conn_string,
+            min_size=int(os.getenv('DB_POOL_MIN', 2)),
+            max_size=int(os.getenv('DB_POOL_MAX', 10)),
+            timeout=float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            # Pre-ping: make sure the server didn't drop a connection while idle
+            check=ConnectionPool.check_connection,
+            configure=_configure_connection,
+            open=True,
+        )
+    except Exception as e:
+        print(f"Database connection error: {e}")
+        return None
+
+POOL = _create_pool()
+
 def get_db_connection():
-    """Establishes a connection to the Supabase (PostgreSQL) database."""
+    """Leases a live connection from the pool (broken ones are discarded by the pool's check)."""
+    if POOL is None:
+        return None
     try:
-        # This MUST be your Connection Pooler string (port 6543)
-        conn_string = os.getenv('DATABASE_URL')
-        if not conn_string:
-            print("DATABASE_URL not found in .env file!")
-            return None
-        
-        conn = psycopg2.connect(conn_string)
-        # print("✅ Database connection successful!") # Optional: Can be noisy
-        return conn
+        return POOL.getconn()
     except Exception as e:
         print(f"Database connection error: {e}")
         return None
 
-@app.context_processor
-def inject_now():
-    """Makes the 'now' variable available to all templates (for copyright year, etc.)."""
-    return {'now': datetime.datetime.utcnow()}
+def put_db_connection(conn):
+    """Returns a leased connection to the pool, rolling back any open transaction."""
+    if POOL is None or conn is None:
+        return
+    if not conn.closed and conn.info.transaction_status != psycopg.pq.TransactionStatus.IDLE:
+        try:
+            conn.rollback()
+        except psycopg.Error:
+            pass  # The pool will notice the broken connection and replace it
+    POOL.putconn(conn)
+
+# Dashboard/report aggregates only change on human timescales, so serve them
+# from a short-lived in-process cache. Writes clear it via invalidate_stats_cache(),
+# but only in the worker that handled the write: other gunicorn workers keep
+# serving their copy until the TTL expires (at most 5 s stale).
+STATS_CACHE = TTLCache(maxsize=16, ttl=5)
+STATS_LOCK = threading.Lock()  # Guards the dicts below; never held across a query
+STATS_KEY_LOCKS = {}  # One lock per cache key, so only misses for the same key wait
+_stats_generation = 0  # Bumped on invalidation so an in-flight miss can't store stale rows
+
+def _cached_stats(keys):
+    """Returns {key: rows} for whichever keys are currently cached."""
+    with STATS_LOCK:
+        results = {}
+        for key in keys:
+            rows = STATS_CACHE.get(key)
+            if rows is not None:
+                results[key] = rows
+        return results
+
+def fetch_cached_stats(conn, queries, row_factory=dict_row):
+    """Returns {key: rows} for a {key: sql} dict, pipelining only the cache misses."""
+    results = _cached_stats(queries)
+    missing = sorted(key for key in queries if key not in results)
+    if not missing:
+        return results
+
+    # Lock each missing key (in a fixed order, so two pages can't deadlock),
+    # then re-check: another request may have filled it while we waited.
+    with STATS_LOCK:
+        key_locks = [STATS_KEY_LOCKS.setdefault(key, threading.Lock()) for key in missing]
+    for lock in key_locks:
+        lock.acquire()
+    try:
+        results.update(_cached_stats(missing))
+        missing = [key for key in missing if key not in results]
+        if missing:
+            with STATS_LOCK:
+                generation = _stats_generation
+            cursors = {key: conn.cursor(row_factory=row_factory) for key in missing}
+            try:
+                with conn.pipeline():
+                    for key in missing:
+                        cursors[key].execute(queries[key])
+                fetched = {key: cursor.fetchall() for key, cursor in cursors.items()}
+            finally:
+                for cursor in cursors.values():
+                    cursor.close()
+            results.update(fetched)
+            with STATS_LOCK:
+                if generation == _stats_generation:
+                    STATS_CACHE.update(fetched)
+    finally:
+        for lock in key_locks:
+            lock.release()
+    return results
+
+def invalidate_stats_cache():
+    """Drops this worker's cached aggregates so its next dashboard/report view reflects a write."""
+    global _stats_generation
+    with STATS_LOCK:
+        _stats_generation += 1
+        STATS_CACHE.clear()
+
+# Locations are reference data for the case form dropdowns and rarely change
+LOC_CACHE = TTLCache(maxsize=1, ttl=300)
+LOC_LOCK = threading.Lock()
+
+def get_locations(conn):
+    """Returns all locations for the case form dropdowns, cached for five minutes."""
+    with LOC_LOCK:
+        locations = LOC_CACHE.get('all')
+        if locations is None:
+            with conn.cursor(row_factory=dict_row) as cursor:
+                cursor.execute("SELECT LocationID, Address, City FROM Location ORDER BY City")
+                locations = LOC_CACHE['all'] = cursor.fetchall()
+        return locations
+
+# Endpoints that talk to the database; everything else (static files, logout,
+# the login/add forms on GET) never leases a connection.
+DB_ENDPOINTS = {
+    'login', 'dashboard', 'reports', 'search', 'criminals', 'add_criminal',
+    'bulk_add_criminals', 'edit_criminal', 'delete_criminal', 'cases', 'add_case', 'edit_case', 'delete_case',
+}
+FORM_ONLY_ON_GET = {'login', 'add_criminal', 'search'}
+
+@app.before_request
+def acquire_db_connection():
+    """Leases one pooled connection per request and stashes it on flask.g."""
+    if request.endpoint not in DB_ENDPOINTS:
+        return
+    if request.method == 'GET' and request.endpoint in FORM_ONLY_ON_GET:
+        return
+    if request.endpoint != 'login' and 'officer_id' not in session:
+        return  # The route will redirect to login without touching the database
+    g.db = get_db_connection()
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    """Hands the request's connection back to the pool once the response is done."""
+    put_db_connection(g.pop('db', None))
+
+# Only the copyright footer needs the year, so read it once at startup
+_YEAR = datetime.datetime.now(datetime.timezone.utc).year
+
+def lazy_now():
+    """Current UTC time; the clock is only read when a template calls it."""
+    return datetime.datetime.now(datetime.timezone.utc)
+
+# Jinja globals are set up once, instead of a context processor running on every request
+app.jinja_env.globals.update(current_year=_YEAR, lazy_now=lazy_now)
+
+# List pages use keyset pagination: each page is the next PAGE_SIZE rows below
+# the ?after=<id> of the previous page's last row, so every page is one index seek.
+PAGE_SIZE = 50
+
+def split_page(rows, id_key):
+    """Drops the look-ahead row; returns (rows, after id for the Next link or None)."""
+    if len(rows) > PAGE_SIZE:
+        rows = rows[:PAGE_SIZE]
+        return rows, rows[-1][id_key]
+    return rows, None
+
+# bcrypt work factor for newly hashed passwords; hashed once here, the dummy
+# hash lets an unknown username cost as much as a wrong password.
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', 12))
+_DUMMY_HASH = bcrypt.hashpw(b'not-a-real-password', bcrypt.gensalt(BCRYPT_ROUNDS))
+
+def verify_password(password, stored_hash):
+    """Checks a login password against a bcrypt hash in constant time.
+
+    Every failure path still runs one bcrypt check, so an unknown username or a
+    non-bcrypt PasswordHash costs as much as a wrong password. Plaintext rows
+    from the sample data are hashed by migrations.sql (section 4); run it
+    before deploying, or those officers can't log in.
+    """
+    password_bytes = password.encode('utf-8')
+    # bcrypt rejects passwords over 72 bytes. Fail them the same way whether or
+    # not the username exists, so the response can't reveal which usernames are real.
+    if len(password_bytes) > 72:
+        return False
+    if stored_hash and stored_hash.startswith(('$2a$', '$2b$', '$2y$')):
+        try:
+            return bcrypt.checkpw(password_bytes, stored_hash.encode('ascii'))
+        except ValueError:
+            pass  # Malformed hash: fall through to the dummy check
+    bcrypt.checkpw(password_bytes, _DUMMY_HASH)
+    return False
 
 # --- 3. AUTHENTICATION ROUTES ---
 
@@ -49,16 +250,21 @@ def login():
         username = request.form['username']
         password = request.form['password']
         
-        conn = get_db_connection()
+        conn = g.get('db')
         if conn:
+            # Use dict_row to get results as dictionaries (all lowercase keys)
+            cursor = conn.cursor(row_factory=dict_row)
             try:
-                # Use DictCursor to get results as dictionaries (all lowercase keys)
-                cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-                cursor.execute('SELECT * FROM LawEnforcement WHERE Username = %s', (username,))
+                cursor.execute(
+                    """
+                    SELECT OfficerID, Username, FirstName, LastName, PasswordHash
+                    FROM LawEnforcement WHERE Username = %s
+                    """,
+                    (username,)
+                )
                 user = cursor.fetchone()
                 
-                # Check plaintext password (as stored in your sample data)
-                if user and user['passwordhash'] == password:
+                if verify_password(password, user['passwordhash'] if user else None):
                     session['officer_id'] = user['officerid']
                     session['username'] = user['username']
                     session['officer_name'] = f"{user['firstname']} {user['lastname']}"
@@ -70,7 +276,6 @@ def login():
                 flash(f'Login error: {str(e)}', 'error')
             finally:
                 cursor.close()
-                conn.close()
         else:
             flash('Database connection failed! Check .env file and network.', 'error')
     
@@ -85,13 +290,48 @@ def logout():
 
 # --- 4. MAIN NAVIGATION ROUTES ---
 
+# All four dashboard counters in a single query, read back as a plain tuple:
+# (total_criminals, open_cases, closed_cases, crime_types)
+DASHBOARD_STATS_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM Criminal),
+        (SELECT COUNT(*) FROM CaseTable WHERE Status IN ('Open', 'Under Investigation')),
+        (SELECT COUNT(*) FROM CaseTable WHERE Status LIKE 'Closed%'),
+        (SELECT COUNT(*) FROM Crime)
+"""
+
+REPORT_QUERIES = {
+    # 1. Get case_status_report (FIXED: as total)
+    'reports_case_status': '''
+        SELECT Status, COUNT(*) as total 
+        FROM CaseTable 
+        GROUP BY Status 
+        ORDER BY Status
+    ''',
+    # 2. Get crime_stats (FIXED: as total)
+    'reports_crime_stats': '''
+        SELECT cr.CrimeType, COUNT(cci.CaseID) as total
+        FROM Crime cr
+        LEFT JOIN CaseCrime cci ON cr.CrimeID = cci.CrimeID
+        GROUP BY cr.CrimeType
+        ORDER BY total DESC
+    ''',
+    # 3. Get criminal_status_report (FIXED: as total)
+    'reports_criminal_status': '''
+        SELECT Status, COUNT(*) as total 
+        FROM Criminal 
+        GROUP BY Status 
+        ORDER BY Status
+    ''',
+}
+
 @app.route('/dashboard')
 def dashboard():
     """Optimized dashboard function to match dashboard.html"""
     if 'officer_id' not in session:
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
+    conn = g.get('db')
     if not conn:
         flash('Database connection failed!', 'error')
         return render_template('dashboard.html', 
@@ -102,37 +342,31 @@ def dashboard():
     total_criminals, open_cases, closed_cases, crime_types = 0, 0, 0, 0
     recent_activities = []
     
+    activity_cursor = conn.cursor(row_factory=dict_row)
     try:
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        
-        cursor.execute('SELECT COUNT(*) as total FROM Criminal')
-        total_criminals = cursor.fetchone()['total']
-        
-        cursor.execute("SELECT COUNT(*) as total FROM CaseTable WHERE Status IN ('Open', 'Under Investigation')")
-        open_cases = cursor.fetchone()['total']
-
-        cursor.execute("SELECT COUNT(*) as total FROM CaseTable WHERE Status LIKE 'Closed%'")
-        closed_cases = cursor.fetchone()['total']
-
-        cursor.execute('SELECT COUNT(*) as total FROM Crime')
-        crime_types = cursor.fetchone()['total']
-
-        cursor.execute("""
-            SELECT c.FirstName, c.LastName, cc.Role, ct.CaseTitle, cc.DateAssociated
-            FROM CriminalCase cc
-            JOIN Criminal c ON cc.CriminalID = c.CriminalID
-            JOIN CaseTable ct ON cc.CaseID = ct.CaseID
-            ORDER BY cc.DateAssociated DESC
-            LIMIT 5
-        """)
+        # Pipeline mode sends both queries back-to-back and waits for one sync,
+        # so the page pays a single network round trip (none for cached stats).
+        with conn.pipeline():
+            activity_cursor.execute("""
+                SELECT c.FirstName, c.LastName, cc.Role, ct.CaseTitle, cc.DateAssociated
+                FROM CriminalCase cc
+                JOIN Criminal c ON cc.CriminalID = c.CriminalID
+                JOIN CaseTable ct ON cc.CaseID = ct.CaseID
+                ORDER BY cc.DateAssociated DESC
+                LIMIT 5
+            """)
+            # Counters don't need dict rows; tuples skip the per-row dict allocation
+            stats = fetch_cached_stats(conn, {'dashboard_stats': DASHBOARD_STATS_SQL},
+                                       row_factory=tuple_row)['dashboard_stats'][0]
+
+        total_criminals, open_cases, closed_cases, crime_types = stats
         # We must use all-lowercase keys in the template
-        recent_activities = cursor.fetchall()
+        recent_activities = activity_cursor.fetchall()
         
     except Exception as e:
         flash(f'Error loading dashboard data: {str(e)}', 'error')
     finally:
-        cursor.close()
-        conn.close()
+        activity_cursor.close()
         
     return render_template('dashboard.html', 
                            officer_name=session.get('officer_name', 'Officer'),
@@ -147,7 +381,7 @@ def reports():
     if 'officer_id' not in session:
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
+    conn = g.get('db')
     if not conn:
         flash('Database connection failed!', 'error')
         # Provide empty lists to prevent render errors
@@ -159,41 +393,13 @@ def reports():
     case_status_report, crime_stats, criminal_status_report = [], [], []
     
     try:
-        cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-        
-        # 1. Get case_status_report (FIXED: as total)
-        cursor.execute('''
-            SELECT Status, COUNT(*) as total 
-            FROM CaseTable 
-            GROUP BY Status 
-            ORDER BY Status
-        ''')
-        case_status_report = cursor.fetchall()
-        
-        # 2. Get crime_stats (FIXED: as total)
-        cursor.execute('''
-            SELECT cr.CrimeType, COUNT(cci.CaseID) as total
-            FROM Crime cr
-            LEFT JOIN CaseCrime cci ON cr.CrimeID = cci.CrimeID
-            GROUP BY cr.CrimeType
-            ORDER BY total DESC
-        ''')
-        crime_stats = cursor.fetchall()
-        
-        # 3. Get criminal_status_report (FIXED: as total)
-        cursor.execute('''
-            SELECT Status, COUNT(*) as total 
-            FROM Criminal 
-            GROUP BY Status 
-            ORDER BY Status
-        ''')
-        criminal_status_report = cursor.fetchall()
-        
+        # Served from STATS_CACHE when fresh; misses go out in one pipeline
+        report = fetch_cached_stats(conn, REPORT_QUERIES)
+        case_status_report = report['reports_case_status']
+        crime_stats = report['reports_crime_stats']
+        criminal_status_report = report['reports_criminal_status']
     except Exception as e:
         flash(f'Error loading reports: {str(e)}', 'error')
-    finally:
-        cursor.close()
-        conn.close()
     
     # Pass the EXACT variable names the HTML expects
     return render_template('reports.html', 
@@ -216,35 +422,34 @@ def search():
             flash('Please select a search type and enter a query.', 'warning')
             return render_template('search.html', results=[], search_type=search_type, query=query_term)
 
-        conn = get_db_connection()
+        conn = g.get('db')
         if not conn:
             flash('Database connection failed!', 'error')
             return render_template('search.html', results=[], search_type=search_type, query=query_term)
         
+        cursor = conn.cursor(row_factory=dict_row)
         try:
-            cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
             search_pattern = f"%{query_term}%" 
 
+            # The concatenated expressions match the pg_trgm GIN indexes in
+            # migrations.sql, so ILIKE '%term%' is index-driven, not a seq scan.
+            # ILIKE does the case folding server-side; the pattern is bound once.
             if search_type == 'criminal':
                 sql = """
-                    SELECT * FROM Criminal 
-                    WHERE LOWER(FirstName) LIKE LOWER(%s) 
-                       OR LOWER(LastName) LIKE LOWER(%s) 
-                       OR LOWER(NationalID) LIKE LOWER(%s)
+                    SELECT CriminalID, FirstName, LastName, NationalID, Status
+                    FROM Criminal 
+                    WHERE (FirstName || ' ' || LastName || ' ' || COALESCE(NationalID, '')) ILIKE %(pattern)s
                 """
-                cursor.execute(sql, (search_pattern, search_pattern, search_pattern))
+                cursor.execute(sql, {'pattern': search_pattern})
                 search_results = cursor.fetchall()
             
             elif search_type == 'case':
                 sql = """
-                    SELECT ct.*, l.Address, l.City 
+                    SELECT ct.CaseID, ct.CaseTitle, ct.DateReported, ct.Status
                     FROM CaseTable ct
-                    LEFT JOIN Location l ON ct.LocationID = l.LocationID
-                    WHERE LOWER(ct.CaseTitle) LIKE LOWER(%s)
-                       OR LOWER(ct.Description) LIKE LOWER(%s)
-                       OR LOWER(ct.CaseNumber) LIKE LOWER(%s)
+                    WHERE (ct.CaseTitle || ' ' || COALESCE(ct.Description, '') || ' ' || COALESCE(ct.CaseNumber, '')) ILIKE %(pattern)s
                 """
-                cursor.execute(sql, (search_pattern, search_pattern, search_pattern))
+                cursor.execute(sql, {'pattern': search_pattern})
                 search_results = cursor.fetchall()
             
             if not search_results:
@@ -256,7 +461,6 @@ def search():
             flash(f'Search error: {str(e)}', 'error')
         finally:
             cursor.close()
-            conn.close()
 
     return render_template('search.html', 
                            results=search_results, 
@@ -271,18 +475,33 @@ def criminals():
     if 'officer_id' not in session:
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
+    conn = g.get('db')
     if not conn:
         flash('Database connection failed!', 'error')
         return render_template('criminals.html', criminals=[])
         
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    cursor.execute('SELECT * FROM Criminal ORDER BY CriminalID DESC')
-    criminals_list = cursor.fetchall()
-    cursor.close()
-    conn.close()
+    after = request.args.get('after', type=int)
+    cursor = conn.cursor(row_factory=dict_row)
+    try:
+        # Only the columns criminals.html renders; one extra row tells us if
+        # there's a next page. The first page has no filter at all, so neither
+        # query variant hides the CriminalID range from the planner.
+        page_filter = 'WHERE CriminalID < %(after)s' if after else ''
+        cursor.execute(f"""
+            SELECT CriminalID, FirstName, LastName, DateOfBirth, Gender, NationalID, Status, DangerLevel
+            FROM Criminal
+            {page_filter}
+            ORDER BY CriminalID DESC
+            LIMIT %(limit)s
+        """, {'after': after, 'limit': PAGE_SIZE + 1})
+        criminals_list, next_after = split_page(cursor.fetchall(), 'criminalid')
+    except Exception as e:
+        flash(f'Error loading criminals: {str(e)}', 'error')
+        criminals_list, next_after = [], None
+    finally:
+        cursor.close()
     
-    return render_template('criminals.html', criminals=criminals_list)
+    return render_template('criminals.html', criminals=criminals_list, after=after, next_after=next_after)
 
 @app.route('/criminals/add', methods=['GET', 'POST'], endpoint='add_criminal')
 def add_criminal():
@@ -300,29 +519,111 @@ def add_criminal():
         status = request.form['status']
         danger_level = request.form['danger_level'] # Matches 'danger_level' from HTML
         
-        conn = get_db_connection()
+        conn = g.get('db')
         if not conn:
             flash('Database connection failed!', 'error')
             return redirect(url_for('criminals'))
             
+        cursor = conn.cursor()
         try:
-            cursor = conn.cursor()
             # Use the stored procedure
             cursor.execute(
                 "SELECT sp_AddCriminalWithCase(%s, %s, %s, %s, %s, %s, %s, %s, NULL, NULL);",
                 (first_name, last_name, dob, gender, national_id, address, status, danger_level)
             )
             conn.commit()
+            invalidate_stats_cache()
             flash(f"Successfully added criminal: {first_name} {last_name}", 'success')
         except Exception as e:
             conn.rollback() 
             flash(f'Error adding criminal: {str(e)}', 'error')
         finally:
             cursor.close()
-            conn.close()
         return redirect(url_for('criminals'))
     
-    return render_template('add_criminal.html')
+    return render_template('add_criminal.html', bulk_max_rows=BULK_MAX_ROWS)
+
+# Column order for bulk imports; CSV headers / JSON keys match the add_criminal.html form fields
+BULK_CRIMINAL_FIELDS = ('first_name', 'last_name', 'dob', 'gender', 'national_id',
+                        'address', 'status', 'danger_level')
+# Imports are all-or-nothing (one transaction), so keep each one to a bounded size
+BULK_MAX_ROWS = 5000
+
+def parse_bulk_criminals():
+    """Reads criminals from a JSON list or an uploaded CSV file into INSERT-ready tuples."""
+    if request.is_json:
+        records = request.get_json(silent=True)  # Malformed JSON falls through to the 400 below
+    else:
+        upload = request.files.get('file')
+        if not upload or not upload.filename:
+            raise ValueError('Please choose a CSV file to import.')
+        reader = csv.DictReader(io.TextIOWrapper(upload.stream, encoding='utf-8-sig'))
+        # Read one row past the cap, just enough to know the file is too big
+        records = list(itertools.islice(reader, BULK_MAX_ROWS + 1))
+
+    if not isinstance(records, list) or not records:
+        raise ValueError('No criminals found in the upload.')
+    if len(records) > BULK_MAX_ROWS:
+        raise ValueError(f'Imports are limited to {BULK_MAX_ROWS} rows; please split the file.')
+
+    rows = []
+    for line, record in enumerate(records, start=1):
+        if not isinstance(record, dict):
+            raise ValueError(f'Row {line} is not a criminal record.')
+        values = [str(record.get(field) or '').strip() for field in BULK_CRIMINAL_FIELDS]
+        missing = [field for field, value in zip(BULK_CRIMINAL_FIELDS, values) if not value]
+        if missing:
+            raise ValueError(f"Row {line} is missing: {', '.join(missing)}")
+        rows.append(tuple(values))
+    return rows
+
+@app.route('/criminals/bulk_add', methods=['POST'], endpoint='bulk_add_criminals')
+def bulk_add_criminals():
+    """Matches the CSV import form in add_criminal.html (also accepts a JSON list)"""
+    if 'officer_id' not in session:
+        return redirect(url_for('login'))
+
+    def respond(message, category, status_code):
+        if request.is_json:
+            key = 'message' if category == 'success' else 'error'
+            return jsonify({key: message}), status_code
+        flash(message, category)
+        return redirect(url_for('criminals' if category == 'success' else 'add_criminal'))
+
+    try:
+        rows = parse_bulk_criminals()
+    except RequestEntityTooLarge:
+        limit_mb = app.config['MAX_CONTENT_LENGTH'] / (1024 * 1024)
+        return respond(f'Error importing criminals: uploads are limited to {limit_mb:g} MB.', 'error', 413)
+    except (ValueError, UnicodeDecodeError, csv.Error) as e:
+        return respond(f'Error importing criminals: {str(e)}', 'error', 400)
+
+    conn = g.get('db')
+    if not conn:
+        return respond('Database connection failed!', 'error', 503)
+
+    cursor = conn.cursor()
+    try:
+        # One transaction for the whole file, so an import is all-or-nothing: any
+        # bad row rolls back every row. psycopg pipelines executemany, so the
+        # batch costs about one round trip instead of one per row.
+        cursor.executemany(
+            """
+            INSERT INTO Criminal
+            (FirstName, LastName, DateOfBirth, Gender, NationalID, Address, Status, DangerLevel)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            """,
+            rows
+        )
+        conn.commit()
+        invalidate_stats_cache()
+    except Exception as e:
+        conn.rollback()
+        return respond(f'Error importing criminals: {str(e)}', 'error', 400)
+    finally:
+        cursor.close()
+
+    return respond(f'Successfully imported {len(rows)} criminal(s).', 'success', 201)
 
 @app.route('/criminals/edit/<int:criminal_id>', methods=['GET', 'POST'], endpoint='edit_criminal')
 def edit_criminal(criminal_id):
@@ -330,12 +631,10 @@ def edit_criminal(criminal_id):
     if 'officer_id' not in session:
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
+    conn = g.get('db')
     if not conn:
         flash('Database connection failed!', 'error')
         return redirect(url_for('criminals'))
-        
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     
     if request.method == 'POST':
         first_name = request.form['first_name']
@@ -348,30 +647,37 @@ def edit_criminal(criminal_id):
         danger_level = request.form['danger_level']
         
         try:
-            cursor.execute(
-                """
-                UPDATE Criminal 
-                SET FirstName = %s, LastName = %s, DateOfBirth = %s, Gender = %s, 
-                    NationalID = %s, Address = %s, Status = %s, DangerLevel = %s,
-                    UpdatedAt = NOW()
-                WHERE CriminalID = %s
-                """,
-                (first_name, last_name, dob, gender, national_id, address, status, danger_level, criminal_id)
-            )
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE Criminal 
+                    SET FirstName = %s, LastName = %s, DateOfBirth = %s, Gender = %s, 
+                        NationalID = %s, Address = %s, Status = %s, DangerLevel = %s,
+                        UpdatedAt = NOW()
+                    WHERE CriminalID = %s
+                    """,
+                    (first_name, last_name, dob, gender, national_id, address, status, danger_level, criminal_id)
+                )
             conn.commit()
+            invalidate_stats_cache()
             flash('Criminal record updated successfully!', 'success')
         except Exception as e:
             conn.rollback()
             flash(f'Error updating criminal: {str(e)}', 'error')
-        finally:
-            cursor.close()
-            conn.close()
         return redirect(url_for('criminals'))
     
     # GET request: Fetch data to pre-fill the form
     try:
-        cursor.execute("SELECT * FROM Criminal WHERE CriminalID = %s", (criminal_id,))
-        criminal = cursor.fetchone()
+        with conn.cursor(row_factory=dict_row) as cursor:
+            cursor.execute(
+                """
+                SELECT CriminalID, FirstName, LastName, DateOfBirth, Gender, NationalID,
+                       Address, Status, DangerLevel
+                FROM Criminal WHERE CriminalID = %s
+                """,
+                (criminal_id,)
+            )
+            criminal = cursor.fetchone()
         if not criminal:
             flash('Criminal not found!', 'error')
             return redirect(url_for('criminals'))
@@ -380,24 +686,22 @@ def edit_criminal(criminal_id):
     except Exception as e:
         flash(f'Error fetching criminal data: {str(e)}', 'error')
         return redirect(url_for('criminals'))
-    finally:
-        if 'cursor' in locals() and cursor: cursor.close()
-        if 'conn' in locals() and conn: conn.close()
 
 @app.route('/criminals/delete/<int:criminal_id>', methods=['POST'], endpoint='delete_criminal')
 def delete_criminal(criminal_id):
     """Matches the <form> in criminals.html"""
     if 'officer_id' not in session:
         return redirect(url_for('login'))
-    conn = get_db_connection()
+    conn = g.get('db')
     if not conn:
         flash('Database connection failed!', 'error')
         return redirect(url_for('criminals'))
         
+    cursor = conn.cursor()
     try:
-        cursor = conn.cursor()
         cursor.execute("DELETE FROM Criminal WHERE CriminalID = %s", (criminal_id,))
         conn.commit()
+        invalidate_stats_cache()
         flash('Criminal record deleted successfully.', 'success')
     except Exception as e:
         conn.rollback()
@@ -408,7 +712,6 @@ def delete_criminal(criminal_id):
             flash(f'Error deleting criminal: {str(e)}', 'error')
     finally:
         cursor.close()
-        conn.close()
     return redirect(url_for('criminals'))
 
 # --- 6. CASE CRUD ROUTES ---
@@ -419,40 +722,64 @@ def cases():
     if 'officer_id' not in session:
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
+    conn = g.get('db')
     if not conn:
         flash('Database connection failed!', 'error')
         return render_template('cases.html', cases=[])
         
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
+    after = request.args.get('after', type=int)
+    cursor = conn.cursor(row_factory=dict_row)
     try:
-        # This query JOINS all related tables and aggregates data
-        sql_query = """
+        # The page of cases is picked first (one extra row tells us if there's a
+        # next page). Criminals and crimes are then aggregated for just those
+        # cases in separate CTEs, so the join never builds the criminals x
+        # crimes cross product.
+        page_filter = 'WHERE CaseID < %(after)s' if after else ''
+        sql_query = f"""
+            WITH page AS (
+                SELECT CaseID, CaseTitle, DateReported, Status, LocationID
+                FROM CaseTable
+                {page_filter}
+                ORDER BY CaseID DESC
+                LIMIT %(limit)s
+            ),
+            case_criminals AS (
+                SELECT cc.CaseID,
+                       STRING_AGG(CONCAT(c.FirstName, ' ', c.LastName), ', '
+                                  ORDER BY c.FirstName, c.LastName) AS criminals
+                FROM page
+                JOIN CriminalCase cc ON cc.CaseID = page.CaseID
+                JOIN Criminal c ON cc.CriminalID = c.CriminalID
+                GROUP BY cc.CaseID
+            ),
+            case_crimes AS (
+                SELECT cci.CaseID,
+                       STRING_AGG(cr.CrimeType, ', ' ORDER BY cr.CrimeType) AS crimes
+                FROM page
+                JOIN CaseCrime cci ON cci.CaseID = page.CaseID
+                JOIN Crime cr ON cci.CrimeID = cr.CrimeID
+                GROUP BY cci.CaseID
+            )
             SELECT
                 ct.CaseID, ct.CaseTitle, ct.DateReported, ct.Status,
                 l.Address, l.City, l.State,
-                STRING_AGG(DISTINCT CONCAT(c.FirstName, ' ', c.LastName), ', ') AS criminals,
-                STRING_AGG(DISTINCT cr.CrimeType, ', ') AS crimes
-            FROM CaseTable ct
+                case_criminals.criminals,
+                case_crimes.crimes
+            FROM page ct
             LEFT JOIN Location l ON ct.LocationID = l.LocationID
-            LEFT JOIN CriminalCase cc ON ct.CaseID = cc.CaseID
-            LEFT JOIN Criminal c ON cc.CriminalID = c.CriminalID
-            LEFT JOIN CaseCrime cci ON ct.CaseID = cci.CaseID
-            LEFT JOIN Crime cr ON cci.CrimeID = cr.CrimeID
-            GROUP BY ct.CaseID, l.Address, l.City, l.State
+            LEFT JOIN case_criminals ON ct.CaseID = case_criminals.CaseID
+            LEFT JOIN case_crimes ON ct.CaseID = case_crimes.CaseID
             ORDER BY ct.CaseID DESC
         """
-        cursor.execute(sql_query)
-        cases_list = cursor.fetchall()
-        
+        cursor.execute(sql_query, {'after': after, 'limit': PAGE_SIZE + 1})
+        cases_list, next_after = split_page(cursor.fetchall(), 'caseid')
     except Exception as e:
         flash(f'Error loading cases: {str(e)}', 'error')
-        cases_list = []
+        cases_list, next_after = [], None
     finally:
         cursor.close()
-        conn.close()
     
-    return render_template('cases.html', cases=cases_list)
+    return render_template('cases.html', cases=cases_list, after=after, next_after=next_after)
 
 @app.route('/cases/add', methods=['GET', 'POST'], endpoint='add_case')
 def add_case():
@@ -460,12 +787,10 @@ def add_case():
     if 'officer_id' not in session:
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
+    conn = g.get('db')
     if not conn:
         flash('Database connection failed!', 'error')
         return redirect(url_for('cases'))
-        
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     
     if request.method == 'POST':
         try:
@@ -477,37 +802,32 @@ def add_case():
             location_id = request.form['location_id']
             officer = request.form['investigating_officer']
             
-            case_number = f"CASE-{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}"
-
-            cursor.execute(
-                """
-                INSERT INTO CaseTable 
-                (CaseTitle, Description, DateReported, Status, Priority, LocationID, InvestigatingOfficer, CaseNumber)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (case_title, description, date_reported, status, priority, location_id, officer, case_number)
-            )
+            # CaseNumber is left to its column DEFAULT (see migrations.sql), so two
+            # cases added in the same second can't collide
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    INSERT INTO CaseTable 
+                    (CaseTitle, Description, DateReported, Status, Priority, LocationID, InvestigatingOfficer)
+                    VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    """,
+                    (case_title, description, date_reported, status, priority, location_id, officer)
+                )
             conn.commit()
+            invalidate_stats_cache()
             flash('Case added successfully!', 'success')
         except Exception as e:
             conn.rollback()
             flash(f'Error adding case: {str(e)}', 'error')
-        finally:
-            cursor.close()
-            conn.close()
         return redirect(url_for('cases'))
 
     # GET request: Show the "add case" form, populating the location dropdown
     try:
-        cursor.execute("SELECT LocationID, Address, City FROM Location ORDER BY City")
-        locations = cursor.fetchall() # Used to populate <select> in HTML
+        locations = get_locations(conn) # Used to populate <select> in HTML
         return render_template('add_case.html', locations=locations)
     except Exception as e:
         flash(f'Error loading page: {str(e)}', 'error')
         return redirect(url_for('cases'))
-    finally:
-        if 'cursor' in locals() and cursor: cursor.close()
-        if 'conn' in locals() and conn: conn.close()
 
 @app.route('/cases/edit/<int:case_id>', methods=['GET', 'POST'], endpoint='edit_case')
 def edit_case(case_id):
@@ -515,12 +835,10 @@ def edit_case(case_id):
     if 'officer_id' not in session:
         return redirect(url_for('login'))
     
-    conn = get_db_connection()
+    conn = g.get('db')
     if not conn:
         flash('Database connection failed!', 'error')
         return redirect(url_for('cases'))
-        
-    cursor = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
     
     if request.method == 'POST':
         try:
@@ -533,33 +851,41 @@ def edit_case(case_id):
             location_id = request.form['location_id']
             officer = request.form['investigating_officer']
             
-            cursor.execute(
-                """
-                UPDATE CaseTable 
-                SET CaseTitle = %s, Description = %s, DateReported = %s, DateClosed = %s, 
-                    Status = %s, Priority = %s, LocationID = %s, InvestigatingOfficer = %s,
-                    UpdatedAt = NOW()
-                WHERE CaseID = %s
-                """,
-                (case_title, description, date_reported, date_closed, status, priority, location_id, officer, case_id)
-            )
+            with conn.cursor() as cursor:
+                cursor.execute(
+                    """
+                    UPDATE CaseTable 
+                    SET CaseTitle = %s, Description = %s, DateReported = %s, DateClosed = %s, 
+                        Status = %s, Priority = %s, LocationID = %s, InvestigatingOfficer = %s,
+                        UpdatedAt = NOW()
+                    WHERE CaseID = %s
+                    """,
+                    (case_title, description, date_reported, date_closed, status, priority, location_id, officer, case_id)
+                )
             conn.commit()
+            invalidate_stats_cache()
             flash('Case updated successfully!', 'success')
         except Exception as e:
             conn.rollback()
             flash(f'Error updating case: {str(e)}', 'error')
-        finally:
-            cursor.close()
-            conn.close()
         return redirect(url_for('cases'))
 
     # GET request: Fetch data to pre-fill the form
     try:
-        cursor.execute("SELECT * FROM CaseTable WHERE CaseID = %s", (case_id,))
-        case = cursor.fetchone()
-        
-        cursor.execute("SELECT LocationID, Address, City FROM Location ORDER BY City")
-        locations = cursor.fetchall() # For the location dropdown
+        # On a location cache miss both queries still share one round trip
+        with conn.cursor(row_factory=dict_row) as cursor:
+            with conn.pipeline():
+                # The editable fields (see the POST branch above) plus the case's identifiers
+                cursor.execute(
+                    """
+                    SELECT CaseID, CaseNumber, CaseTitle, Description, DateReported, DateClosed,
+                           Status, Priority, LocationID, InvestigatingOfficer
+                    FROM CaseTable WHERE CaseID = %s
+                    """,
+                    (case_id,)
+                )
+                locations = get_locations(conn) # For the location dropdown
+            case = cursor.fetchone()
         
         if not case:
             flash('Case not found!', 'error')
@@ -570,9 +896,6 @@ def edit_case(case_id):
     except Exception as e:
         flash(f'Error fetching case data: {str(e)}', 'error')
         return redirect(url_for('cases'))
-    finally:
-        if 'cursor' in locals() and cursor: cursor.close()
-        if 'conn' in locals() and conn: conn.close()
 
 @app.route('/cases/delete/<int:case_id>', methods=['POST'], endpoint='delete_case')
 def delete_case(case_id):
@@ -580,29 +903,31 @@ def delete_case(case_id):
     if 'officer_id' not in session:
         return redirect(url_for('login'))
         
-    conn = get_db_connection()
+    conn = g.get('db')
     if not conn:
         flash('Database connection failed!', 'error')
         return redirect(url_for('cases'))
         
+    cursor = conn.cursor()
     try:
-        cursor = conn.cursor()
         cursor.execute("DELETE FROM CaseTable WHERE CaseID = %s", (case_id,))
         conn.commit()
+        invalidate_stats_cache()
         flash('Case deleted successfully.', 'success')
     except Exception as e:
         conn.rollback()
         flash(f'Error deleting case: {str(e)}', 'error')
     finally:
         cursor.close()
-        conn.close()
         
     return redirect(url_for('cases'))
 
 # --- 7. RUN THE APPLICATION ---
 
+# Local development only: this is Werkzeug's single-worker server. In
+# production run `gunicorn wsgi:app` (gevent workers, see gunicorn.conf.py).
 if __name__ == '__main__':
  
     print(f" Open: http://localhost:{os.getenv('PORT', 5000)}")
     print("Login: admin / admin123")
-    app.run(debug=True, host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
\ No newline at end of file
+    app.run(debug=app.debug, host='0.0.0.0', port=int(os.getenv('PORT', 5000)))
\ No newline at end of file
@@ -0,0 +1,16 @@
+"""Production entry point.
+
+Run with gunicorn (settings live in gunicorn.conf.py):
+
+    gunicorn wsgi:app
+
+which is the same as `gunicorn -k gevent -w 4 --worker-connections 100 wsgi:app`.
+"""
+# Patch the stdlib before anything else imports it, so the connection pool's
+# threads and psycopg's socket waits yield to other greenlets instead of
+# blocking the whole worker. psycopg 3 detects the patching by itself
+# (psycogreen is only needed for psycopg2).
+from gevent import monkey
+monkey.patch_all()
+
+from run_criminal_dbms import app  # noqa: E402